@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from time import sleep
 
-import requests
+import dither
+import httpx
 import utils
 import uvicorn
-from escpos.printer import Usb
+from escpos.printer import Dummy, Usb
 from fastapi import FastAPI, File, Form, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from PIL import Image
@@ -20,12 +25,166 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shared async HTTP client: keep-alive + TLS session reuse across fetches,
+# and downloads no longer block the event loop like requests.get did.
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=10.0,
+    follow_redirects=True,  # match requests.get; image URLs often 301/302
+    limits=httpx.Limits(max_keepalive_connections=8),
+)
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+
+# All printer work is funneled through one queue drained by a single worker
+# task: concurrent requests can't interleave bytes on the shared USB endpoint,
+# and the event loop never blocks on slow p.image/p.text calls.
+print_queue: asyncio.Queue = asyncio.Queue(maxsize=32)
+
+# One dedicated thread for the decode/resize/raster + USB work; max_workers=1
+# doubles as the printer lock, and print jobs never compete with the default
+# executor's other tasks.
+PRINT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+
+async def _printer_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        fn, args, future = await print_queue.get()
+        try:
+            result = await loop.run_in_executor(PRINT_EXECUTOR, fn, *args)
+            if not future.cancelled():
+                future.set_result(result)
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        finally:
+            print_queue.task_done()
+
+
+async def run_print_job(fn, *args):
+    future = asyncio.get_running_loop().create_future()
+    await print_queue.put((fn, args, future))
+    return await future
+
+
+# strong reference: the loop only keeps weak refs to tasks, and a collected
+# worker would leave every request hanging on its future forever
+_printer_worker_task = None
+
+
+@app.on_event("startup")
+async def start_printer_worker():
+    global _printer_worker_task
+    _printer_worker_task = asyncio.get_running_loop().create_task(_printer_worker())
+
+
+@app.on_event("shutdown")
+async def stop_printer_worker():
+    if _printer_worker_task is not None:
+        _printer_worker_task.cancel()
+    PRINT_EXECUTOR.shutdown(wait=False)
+
 # vendor id, product id, lsusb -vvv -d 1504:0101 | grep bEndpointAddress
 p = Usb(0x1504, 0x0101, out_ep=0x02, in_ep=0x81)
-sleep(1)
+# poll until the printer answers a status query (DLE EOT 1) instead of a
+# blind 1 s warmup sleep; the OUT write alone is ACKed as soon as the device
+# enumerates, so readiness means the one-byte status actually came back.
+# Worst case matches the old delay.
+for _ in range(20):
+    try:
+        p._raw(b"\x10\x04\x01")
+        if p._read():
+            break
+    except Exception:
+        pass
+    sleep(0.05)
 p.charcode("CP850")
 
 
+_raster_cache: OrderedDict = OrderedDict()
+_RASTER_CACHE_SIZE = 64
+
+
+def _cut_bytes() -> bytes:
+    d = Dummy()
+    d.cut()
+    return d.output
+
+
+# The cut sequence never changes; append it to payloads so every request is
+# a single USB bulk write instead of one transfer per escpos call.
+_CUT_RAW = _cut_bytes()
+
+
+def _render_escpos(digest: bytes, fp, photo: bool = False) -> bytes:
+    """Decode, resize and raster-convert an image to raw ESC/POS bytes."""
+    key = (digest, photo)
+    raw = _raster_cache.get(key)
+    if raw is not None:
+        _raster_cache.move_to_end(key)
+        return raw
+
+    image = Image.open(fp)
+
+    max_width = 512
+
+    # JPEG fast-path: let libjpeg decode grayscale at 1/2, 1/4 or 1/8 scale
+    # straight from the DCT coefficients; the resize below finishes the ratio.
+    try:
+        image.draft("L", (max_width, max_width))
+    except AttributeError:
+        pass  # only JPEG supports draft mode
+
+    # grayscale early: the threshold/dither step needs L anyway, and the
+    # resize then moves 1 byte per pixel instead of 3
+    if image.mode != "L":
+        image = image.convert("L")
+
+    # Resize image if width exceeds 512px
+    if image.width > max_width:
+        aspect_ratio = image.height / image.width
+        new_height = int(max_width * aspect_ratio)
+        image = image.resize((max_width, new_height), resample=Image.Resampling.LANCZOS)
+
+    if photo:
+        # Error-diffusion dithering keeps much more detail on photos than
+        # the plain threshold in fast_raster.
+        image = dither.fs_dither(image)
+    raw = utils.fast_raster(image)
+
+    _raster_cache[key] = raw
+    if len(_raster_cache) > _RASTER_CACHE_SIZE:
+        _raster_cache.popitem(last=False)
+    return raw
+
+
+def _hash_stream(fp) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: fp.read(64 * 1024), b""):
+        h.update(chunk)
+    fp.seek(0)
+    return h.digest()
+
+
+def print_image_cached(contents: bytes, photo: bool = False):
+    # Repeated prints of the same bytes (motion camera bursts, re-posted
+    # memes) skip the decode + resize + dither work and go straight to USB.
+    digest = hashlib.blake2b(contents, digest_size=16).digest()
+    p._raw(_render_escpos(digest, BytesIO(contents), photo) + _CUT_RAW)
+
+
+def print_image_file(fp, photo: bool = False):
+    # Streaming variant: hash the spooled upload in chunks and let PIL read
+    # straight from it, so the whole file never sits in memory alongside the
+    # decoded copy.
+    p._raw(_render_escpos(_hash_stream(fp), fp, photo) + _CUT_RAW)
+
+
 @app.post("/print/text")
 async def print_text_api(request: Request, text: str = Form(...), fast: bool = Query(False)):
     # Also accept fast from multipart form-data, so curl/fetch can send it
@@ -34,16 +193,23 @@ async def print_text_api(request: Request, text: str = Form(...), fast: bool = Q
         form = await request.form()
         if "fast" in form:
             fast = form["fast"].lower() in ("1", "true", "yes", "on")
-    try:
-        print("printer tekst:", text)
+    def job():
+        # Build the whole ESC/POS stream in a Dummy and ship it as one USB
+        # write instead of one bulk transfer per escpos call.
+        d = Dummy()
+        d.charcode("CP850")
         if fast:
-            # Fast path: send raw ESC/POS text. The printer's charcode is set
-            # to CP850 above; python-escpos will encode the string accordingly.
-            # Norwegian characters (æøå ÆØÅ) exist in CP850.
-            p.text(text)
+            # Fast path: send raw ESC/POS text; python-escpos encodes the
+            # string to CP850. Norwegian characters (æøå ÆØÅ) exist in CP850.
+            d.text(text)
         else:
-            p.image(utils.print_text(text))
-        p.cut()
+            d.image(utils.print_text(text))
+        d.cut()
+        p._raw(d.output)
+
+    try:
+        print("printer tekst:", text)
+        await run_print_job(job)
         return {"status": "success", "message": "Text printed successfully"}
     except (IOError, UnicodeError) as e:
         return {"status": "error", "message": f"Printing failed: {str(e)}"}
@@ -51,41 +217,40 @@ async def print_text_api(request: Request, text: str = Form(...), fast: bool = Q
 
 @app.post("/print/task")
 async def print_task_api(text: str = Form(...), task_type: utils.TaskType = Form(...)):
+    def job():
+        d = Dummy()
+        d.image(utils.print_task(text, task_type))
+        d.cut()
+        p._raw(d.output)
+
     try:
-        p.image(utils.print_task(text, task_type))
-        p.cut()
+        await run_print_job(job)
         return {"status": "success", "message": "Image printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error printing task: {e}"}
 
 
 @app.post("/print/image")
-async def print_image_api(file: UploadFile = File(...)):
+async def print_image_api(file: UploadFile = File(...), photo: bool = Query(False)):
     if not file.content_type or "image" not in file.content_type:
         return {"status": "error", "message": "File is not recognized as an image"}
 
+    def job(fp):
+        print_image_file(fp, photo)
+
     try:
-        image_data = await file.read()
-        image = Image.open(BytesIO(image_data))
-
-        # Resize image if width exceeds 512px
-        max_width = 512
-        if image.width > max_width:
-            aspect_ratio = image.height / image.width
-            new_height = int(max_width * aspect_ratio)
-            image = image.resize((max_width, new_height))
-
-        p.image(image)
-        p.cut()
+        # UploadFile wraps a SpooledTemporaryFile; hand it to PIL directly
+        # instead of buffering the whole upload with await file.read().
+        await run_print_job(job, file.file)
         return {"status": "success", "message": "Image printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Failed to print image: {str(e)}"}
 
 
 @app.post("/print/url")
-async def print_from_url_api(url: str = Form(...)):
+async def print_from_url_api(url: str = Form(...), photo: bool = Query(False)):
     try:
-        response = requests.get(url)
+        response = await http_client.get(url)
         if response.status_code != 200:
             return {"status": "error", "message": f"Failed to download image: HTTP {response.status_code}"}
 
@@ -94,21 +259,16 @@ async def print_from_url_api(url: str = Form(...)):
         if 'image' not in content_type:
             return {"status": "error", "message": "URL does not point to an image"}
 
-        image = Image.open(BytesIO(response.content))
-
-        # Resize image if width exceeds 512px
-        max_width = 512
-        if image.width > max_width:
-            aspect_ratio = image.height / image.width
-            new_height = int(max_width * aspect_ratio)
-            image = image.resize((max_width, new_height))
+        def job(contents):
+            print_image_cached(contents, photo)
 
-        p.image(image)
-        p.cut()
+        await run_print_job(job, response.content)
         return {"status": "success", "message": "Image from URL printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Failed to print image from URL: {str(e)}"}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop + httptools ship with uvicorn[standard] and cut per-request
+    # event-loop overhead vs the stock asyncio selector loop.
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
\ No newline at end of file
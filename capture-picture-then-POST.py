@@ -1,6 +1,13 @@
 import io
 import requests
+from requests.adapters import HTTPAdapter
 from picamera2 import Picamera2
+from PIL import Image
+
+# Keep-alive session: repeat posts to the printer API reuse the same TCP
+# connection instead of paying the handshake every time
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
 # Create a Picamera2 object
 picam2 = Picamera2()
@@ -13,26 +20,33 @@ picam2.configure(camera_config)
 # Start the camera
 picam2.start()
 
-# Create an in-memory binary stream
-virtual_file = io.BytesIO()
-
-# Capture the image to the virtual file
-# The format can be specified (e.g., "jpeg", "png", "bmp")
-picam2.capture_file(virtual_file, format="jpeg")
+# Capture straight to a numpy array instead of encoding a full-size JPEG;
+# the printer only needs 512px wide, so resize here and ship a small PNG.
+arr = picam2.capture_array("main")
 
 # Stop the camera
 picam2.stop()
 
+# Grayscale, downscale, then Floyd-Steinberg to 1-bit: the printer is 1bpp
+# anyway, and a dithered 512-wide PNG is ~24x smaller on the wire than RGB
+img = Image.fromarray(arr).convert("L")
+img.thumbnail((512, 10000), Image.Resampling.LANCZOS)
+img = img.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+
+# Save the final-form image to an in-memory binary stream
+virtual_file = io.BytesIO()
+img.save(virtual_file, format="PNG", optimize=True)
+
 # Reset the stream position to the beginning
 virtual_file.seek(0)
 
 # POST the image to the specified URL
 url = "http://192.168.50.19:8000/print/image"
-files = {"file": ("image.jpeg", virtual_file, "image/jpeg")}
+files = {"file": ("image.png", virtual_file, "image/png")}
 
 try:
-    response = requests.post(url, files=files)
+    response = session.post(url, files=files, timeout=5)
     print(f"POST request status code: {response.status_code}")
     print(f"Response: {response.text}")
 except requests.exceptions.RequestException as e:
-    print(f"Error sending POST request: {e}")
\ No newline at end of file
+    print(f"Error sending POST request: {e}")
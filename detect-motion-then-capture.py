@@ -1,34 +1,49 @@
+import atexit
 import io
 import requests
+from requests.adapters import HTTPAdapter
 import threading
 from datetime import datetime
 from signal import pause
 from gpiozero import MotionSensor
 from picamera2 import Picamera2
+from PIL import Image
+
+# Initialize the camera once and keep it running; re-init plus start per
+# motion event costs hundreds of ms on the motion-to-print path.
+picam2 = Picamera2()
+picam2.configure(picam2.create_still_configuration())
+picam2.start()
+atexit.register(picam2.stop)
+
+# Keep-alive session: bursts of motion events reuse the same TCP connection
+# to the printer API instead of paying the handshake every time
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
 def capture_and_post_image():
-    picam2 = Picamera2()
-    
     try:
-        camera_config = picam2.create_still_configuration()
-        picam2.configure(camera_config)
-        picam2.start()
-        
+        # Capture a numpy array instead of encoding a full-size JPEG; resize
+        # here so only a small pre-sized PNG goes over the wire.
+        arr = picam2.capture_array("main")
+        # Grayscale, downscale, then Floyd-Steinberg to 1-bit: the printer is
+        # 1bpp anyway, and a dithered 512-wide PNG is ~24x smaller on the wire
+        img = Image.fromarray(arr).convert("L")
+        img.thumbnail((512, 10000), Image.Resampling.LANCZOS)
+        img = img.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
         virtual_file = io.BytesIO()
-        picam2.capture_file(virtual_file, format="jpeg")
+        img.save(virtual_file, format="PNG", optimize=True)
         virtual_file.seek(0)
-        
+
         url = "http://192.168.50.19:8000/print/image"
-        files = {"file": ("image.jpeg", virtual_file, "image/jpeg")}
+        files = {"file": ("image.png", virtual_file, "image/png")}
         
-        response = requests.post(url, files=files)
+        response = session.post(url, files=files, timeout=5)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         print(f"{timestamp} - Image captured and posted. Status: {response.status_code}")
         
     except Exception as e:
         print(f"Error capturing or posting image: {e}")
-    finally:
-        picam2.stop()
 
 pir = MotionSensor(14)
 cooldown_timer = None
@@ -1,18 +1,20 @@
 import asyncio
+import hashlib
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from os import getenv
+from os import cpu_count, getenv
 from time import sleep
 
 import discord
-import requests
+import httpx
 import utils
 import uvicorn
 from discord.ext import commands
 from dotenv import load_dotenv
 from escpos.printer import Usb
 from fastapi import FastAPI, File, Form, Query, UploadFile
-from PIL import Image
 
 load_dotenv()
 
@@ -20,20 +22,122 @@ bot = commands.Bot()
 guilds = [1404898665302331513, 455152675617767424]
 app = FastAPI()
 
+# Shared async HTTP client: keep-alive + TLS session reuse on repeat Discord
+# CDN fetches, and downloads no longer block the event loop like requests.get.
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=10.0,
+    follow_redirects=True,  # match requests.get; image URLs often 301/302
+    limits=httpx.Limits(max_keepalive_connections=8),
+)
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
 # vendor id, product id, lsusb -vvv -d 1504:0101 | grep bEndpointAddress
 p = Usb(0x1504, 0x0101, out_ep=0x02, in_ep=0x81)
-sleep(1)
+# poll until the printer answers a status query (DLE EOT 1) instead of a
+# blind 1 s warmup sleep; the OUT write alone is ACKed as soon as the device
+# enumerates, so readiness means the one-byte status actually came back.
+# Worst case matches the old delay.
+for _ in range(20):
+    try:
+        p._raw(b"\x10\x04\x01")
+        if p._read():
+            break
+    except Exception:
+        pass
+    sleep(0.05)
 p.charcode("CP850")
 
+
+_raster_cache: OrderedDict = OrderedDict()
+_RASTER_CACHE_SIZE = 64
+
+
+def _render_escpos(digest: bytes, fp) -> bytes:
+    """Decode, resize and raster-convert an image to raw ESC/POS bytes."""
+    raw = _raster_cache.get(digest)
+    if raw is not None:
+        _raster_cache.move_to_end(digest)
+        return raw
+
+    raw = utils.fast_raster(utils.prepare_image(fp))
+
+    _raster_cache[digest] = raw
+    if len(_raster_cache) > _RASTER_CACHE_SIZE:
+        _raster_cache.popitem(last=False)
+    return raw
+
+
+def _hash_stream(fp) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: fp.read(64 * 1024), b""):
+        h.update(chunk)
+    fp.seek(0)
+    return h.digest()
+
+
+def print_image_cached(contents: bytes):
+    # Repeated prints of the same bytes (re-posted memes) skip the decode +
+    # resize + dither work and go straight to USB.
+    digest = hashlib.blake2b(contents, digest_size=16).digest()
+    p._raw(_render_escpos(digest, BytesIO(contents)))
+
+
+def print_image_file(fp):
+    # Streaming variant: hash the spooled upload in chunks and let PIL read
+    # straight from it, so the whole file never sits in memory alongside the
+    # decoded copy.
+    p._raw(_render_escpos(_hash_stream(fp), fp))
+
+
+# One lock serializes access to the single USB device. A threading.Lock
+# rather than asyncio.Lock because the bot and uvicorn run separate event
+# loops in separate threads; printer I/O always happens in a worker thread.
+printer_lock = threading.Lock()
+
+
+async def run_print_job(fn, *args):
+    def locked():
+        with printer_lock:
+            fn(*args)
+
+    await asyncio.to_thread(locked)
+
+
+# asyncio's default executor caps its thread count low; share one pool sized
+# to the core count so concurrent renders via to_thread can use the whole
+# CPU. A single module-level instance means repeated installs (on_ready
+# re-fires on every gateway reconnect) never spawn new threads. USB writes
+# stay serialized by printer_lock regardless.
+RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=cpu_count())
+
+
+@app.on_event("startup")
+async def widen_api_executor():
+    asyncio.get_running_loop().set_default_executor(RENDER_EXECUTOR)
+
+
+@bot.event
+async def on_ready():
+    asyncio.get_running_loop().set_default_executor(RENDER_EXECUTOR)
+
 # Initialize image backend for advanced text rendering
 
 
 @bot.slash_command(name="print-tekst", guild_ids=guilds)
 async def print_tekst(ctx, melding: str):
-    try:
-        # p.text(melding)
+    def job():
         p.image(utils.print_text(melding))
         p.cut()
+
+    try:
+        # render and print off the event loop so the gateway heartbeat keeps
+        # running
+        await run_print_job(job)
         print(f"melding: {melding}")
         await ctx.respond("Printet meldingen.")
     except Exception as e:
@@ -46,20 +150,17 @@ async def print_bilde(ctx, bilde: discord.Attachment):
 
     if bilde.content_type and "image" in bilde.content_type:
         # save image to in-memory file object
-        response = requests.get(bilde.url)
+        response = await http_client.get(bilde.url)
         if response.status_code == 200:
-            try:
-                image = Image.open(BytesIO(response.content))
-
-                # Resize image if width exceeds 512px
-                max_width = 512
-                if image.width > max_width:
-                    aspect_ratio = image.height / image.width
-                    new_height = int(max_width * aspect_ratio)
-                    image = image.resize((max_width, new_height))
 
-                p.image(image)
+            def job(contents):
+                print_image_cached(contents)
                 p.cut()
+
+            try:
+                # decode/resize/raster runs off-loop; the gateway heartbeat
+                # and ctx.respond stay responsive during big images
+                await run_print_job(job, response.content)
                 await ctx.respond("Printet bildet.")
                 return
             except Exception as e:
@@ -82,12 +183,15 @@ async def print_text_api(text: str = Form(...), fast: bool = Query(False)):
         # Fix encoding issue for Norwegian characters
         decoded_text = text.encode('latin1').decode('utf-8')
         print("printer tekst:", decoded_text)
-        # p.text(decoded_text)
-        if fast:
-            p.text(decoded_text)
-        else:
-            p.image(utils.print_text(decoded_text))
-        p.cut()
+
+        def job():
+            if fast:
+                p.text(decoded_text)
+            else:
+                p.image(utils.print_text(decoded_text))
+            p.cut()
+
+        await run_print_job(job)
         return {"status": "success", "message": "Text printed successfully"}
     except (IOError, UnicodeDecodeError) as e:
         return {"status": "error", "message": f"Printing failed: {str(e)}"}
@@ -95,9 +199,12 @@ async def print_text_api(text: str = Form(...), fast: bool = Query(False)):
 
 @app.post("/print/task")
 async def print_task_api(text: str = Form(...), task_type: utils.TaskType = Form(...)):
-    try:
+    def job():
         p.image(utils.print_task(text, task_type))
         p.cut()
+
+    try:
+        await run_print_job(job)
         return {"status": "success", "message": "Image printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error printing task: {e}"}
@@ -108,19 +215,14 @@ async def print_image_api(file: UploadFile = File(...)):
     if not file.content_type or "image" not in file.content_type:
         return {"status": "error", "message": "File is not recognized as an image"}
 
-    try:
-        image_data = await file.read()
-        image = Image.open(BytesIO(image_data))
-
-        # Resize image if width exceeds 512px
-        max_width = 512
-        if image.width > max_width:
-            aspect_ratio = image.height / image.width
-            new_height = int(max_width * aspect_ratio)
-            image = image.resize((max_width, new_height))
-
-        p.image(image)
+    def job(fp):
+        print_image_file(fp)
         p.cut()
+
+    try:
+        # UploadFile wraps a SpooledTemporaryFile; hand it to PIL directly
+        # instead of buffering the whole upload with await file.read().
+        await run_print_job(job, file.file)
         return {"status": "success", "message": "Image printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Failed to print image: {str(e)}"}
@@ -129,7 +231,7 @@ async def print_image_api(file: UploadFile = File(...)):
 @app.post("/print/url")
 async def print_from_url_api(url: str = Form(...)):
     try:
-        response = requests.get(url)
+        response = await http_client.get(url)
         if response.status_code != 200:
             return {"status": "error", "message": f"Failed to download image: HTTP {response.status_code}"}
 
@@ -138,17 +240,11 @@ async def print_from_url_api(url: str = Form(...)):
         if 'image' not in content_type:
             return {"status": "error", "message": "URL does not point to an image"}
 
-        image = Image.open(BytesIO(response.content))
-
-        # Resize image if width exceeds 512px
-        max_width = 512
-        if image.width > max_width:
-            aspect_ratio = image.height / image.width
-            new_height = int(max_width * aspect_ratio)
-            image = image.resize((max_width, new_height))
+        def job(contents):
+            print_image_cached(contents)
+            p.cut()
 
-        p.image(image)
-        p.cut()
+        await run_print_job(job, response.content)
         return {"status": "success", "message": "Image from URL printed successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Failed to print image from URL: {str(e)}"}
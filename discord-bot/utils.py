@@ -1,8 +1,13 @@
+import struct
 from enum import Enum
+from functools import lru_cache
+from io import BytesIO
 from math import ceil
 from typing import Literal
+import numpy as np
 from PIL import Image, ImageFont, ImageDraw
 from pilmoji.core import Pilmoji
+from pilmoji.source import TwitterEmojiSource
 from string import ascii_letters
 from pathlib import Path
 
@@ -11,43 +16,155 @@ MAX_WIDTH = 512
 # font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
 # font_path = "OpenSans-VariableFont_wdth,wght.ttf"
 font_path = Path(__file__).parent / "OpenSans-VariableFont_wdth,wght.ttf"
-FONT = ImageFont.truetype(font_path, 48)
-FONT_LARGE = ImageFont.truetype(font_path, 80)
+
+
+@lru_cache(maxsize=8)
+def _load_truetype(path, size):
+    # memoized so every (path, size) pair parses the TTF exactly once
+    return ImageFont.truetype(path, size)
+
+
+FONT = _load_truetype(font_path, 48)
+FONT_LARGE = _load_truetype(font_path, 80)
+
+_EMOJI_DIR = Path(__file__).parent / "emoji"
+
+
+class _DiskCachedEmojiSource(TwitterEmojiSource):
+    """Twemoji source with an on-disk cache: each glyph costs one HTTP fetch
+    per install, after which renders work offline from ./emoji."""
+
+    def get_emoji(self, emoji):
+        path = _EMOJI_DIR / ("-".join(f"{ord(c):x}" for c in emoji) + ".png")
+        if path.is_file():
+            return BytesIO(path.read_bytes())
+        stream = super().get_emoji(emoji)
+        if stream is not None:
+            _EMOJI_DIR.mkdir(exist_ok=True)
+            path.write_bytes(stream.getvalue())
+            stream.seek(0)
+        return stream
+
+
+# one shared instance so its HTTP session is also reused across renders
+EMOJI_SOURCE = _DiskCachedEmojiSource()
+
+
+def prepare_image(fp):
+    """Open an image and downscale to MAX_WIDTH with the cheapest filter that
+    fits: JPEG draft during decode, integer box reduce when the ratio is
+    exact, BOX resample otherwise."""
+    im = Image.open(fp)
+
+    # hint the JPEG decoder to downscale during decode (no-op for other
+    # formats); both bounds must be tight or the computed DCT scale is 0
+    im.draft("L", (MAX_WIDTH, MAX_WIDTH))
+
+    if im.width > MAX_WIDTH:
+        if im.width % MAX_WIDTH == 0:
+            # pure box filter, no convolution kernel at all
+            im = im.reduce(im.width // MAX_WIDTH)
+        else:
+            im = im.resize(
+                (MAX_WIDTH, int(MAX_WIDTH * im.height / im.width)),
+                resample=Image.Resampling.BOX,
+            )
+    return im
+
+
+def fast_raster(img, threshold=128):
+    """Pack a PIL image into a single GS v 0 ESC/POS raster command.
+
+    NumPy thresholds and bit-packs the whole frame at once instead of the
+    per-pixel Python loop inside python-escpos' image().
+    """
+    a = np.asarray(img.convert("L"))
+    bits = (a < threshold).astype(np.uint8)
+    width = ((bits.shape[1] + 7) // 8) * 8
+    bits = np.pad(bits, ((0, 0), (0, width - bits.shape[1])))
+    packed = np.packbits(bits, axis=1).tobytes()
+    return b"\x1dv0\x00" + struct.pack("<HH", width // 8, bits.shape[0]) + packed
 
 
 def font_height(font, string=None):
-    if string is not None:
-        l, t, r, b = font.getbbox(string)
-    l, t, r, b = font.getbbox(ascii_letters)
+    # the string branch used to be dead code: its bbox was immediately
+    # overwritten by the ascii_letters one
+    l, t, r, b = font.getbbox(string if string is not None else ascii_letters)
     return b - t
 
 
+# layout constants: the fonts never change at runtime, so measure them once
+# at import instead of on every render
+_H_FONT = font_height(FONT)
+_H_FONT_LARGE = font_height(FONT_LARGE)
+
+
 def font_str_width(font, string):
-    l, t, r, b = font.getbbox(string)
-    return r - l
+    # getlength is a single horizontal-advance query; getbbox also computes
+    # vertical metrics we never used
+    return font.getlength(string)
+
+
+@lru_cache(maxsize=4096)
+def _word_width(font, word):
+    return font.getlength(word)
+
+
+def _has_emoji(string):
+    # cheap over-approximation: everything Pilmoji can substitute lives above
+    # the basic text range. False positives just take the slower (correct)
+    # Pilmoji path.
+    return any(ord(c) > 0x2000 for c in string)
 
 
 def wrap_long_string(long_text, max_width, font):
+    """Wrap to max_width pixels; returns (wrapped, widest_line_width) so
+    callers can align without re-measuring."""
+    # most messages already fit on one line; skip the word-by-word probing
+    whole_width = font_str_width(font, long_text)
+    if whole_width <= max_width:
+        return long_text, whole_width
+
+    space_width = _word_width(font, ' ')
     lines = []
     current_line = []
-    words = long_text.split(' ')
+    current_width = 0.0
+    widest = 0.0
 
-    for word in words:
-        test_line = ' '.join(current_line + [word])
+    for word in long_text.split(' '):
+        # keep a running width instead of re-measuring the whole prefix for
+        # every word; repeated words hit the lru cache
+        new_width = (
+            current_width + (space_width if current_line else 0) + _word_width(font, word)
+        )
 
-        if font_str_width(font, test_line) <= max_width:
+        if new_width <= max_width:
             current_line.append(word)
+            current_width = new_width
         else:
             lines.append(' '.join(current_line))
+            widest = max(widest, current_width)
             current_line = [word]
+            current_width = _word_width(font, word)
     lines.append(' '.join(current_line))  # Add the last line
-    return "\n".join(lines)
+    widest = max(widest, current_width)
+    return "\n".join(lines), widest
+
 
+def draw_string(target, font, string, pos, padding_x=0, align: Literal["left", "center", "right"] = "left", text_width=None):
+    # target is a PIL Image or an already-open Pilmoji bound to one, so
+    # callers drawing several strings can pay Pilmoji's setup cost once
+    image = target if isinstance(target, Image.Image) else target.image
 
-def draw_string(image, font, string, pos, padding_x=0, align: Literal["left", "center", "right"] = "left"):
-    wrapped = wrap_long_string(string, image.width - padding_x * 2, font)
+    # a string counts as pre-wrapped only when the caller measured it too
+    # (text_width from wrap_long_string); raw input that merely contains
+    # newlines still goes through wrapping so long lines can't clip
+    if "\n" in string and text_width is not None:
+        wrapped = string
+    else:
+        wrapped, text_width = wrap_long_string(string, image.width - padding_x * 2, font)
 
-    spare_space = image.width - font_str_width(font, wrapped) - padding_x * 2
+    spare_space = image.width - text_width - padding_x * 2
 
     x = pos[0] + padding_x
     if align == "center" and spare_space > 0:
@@ -56,10 +173,18 @@ def draw_string(image, font, string, pos, padding_x=0, align: Literal["left", "c
     elif align == "right" and spare_space > 0:
         x += spare_space
 
-    draw = ImageDraw.Draw(image)
     # draw.text((pos[0] + padding_x, pos[1]), wrapped, font=font)
-    with Pilmoji(image) as pilmoji:
-        pilmoji.text((x, pos[1]), wrapped, font=font)
+    if isinstance(target, Image.Image):
+        if not _has_emoji(wrapped):
+            # no emoji anywhere: plain ImageDraw skips Pilmoji's codepoint
+            # scan and PNG compositing entirely
+            ImageDraw.Draw(image).multiline_text((x, pos[1]), wrapped,
+                                                 font=font, fill=0)
+        else:
+            with Pilmoji(image, source=EMOJI_SOURCE) as pilmoji:
+                pilmoji.text((x, pos[1]), wrapped, font=font)
+    else:
+        target.text((x, pos[1]), wrapped, font=font)
 
 
 class TaskType(str, Enum):
@@ -69,7 +194,34 @@ class TaskType(str, Enum):
     ARCHIVE = "Archive"
 
 
-def print_task(task, task_type: TaskType):
+def _blank_canvas(height):
+    # numpy owns the pixels and frombuffer wraps them without a copy, so the
+    # frame never round-trips through Pillow's allocator; frombuffer marks
+    # shared memory read-only, which would force paste/draw to copy, hence
+    # the readonly reset.
+    arr = np.full((height, MAX_WIDTH), 255, np.uint8)
+    im = Image.frombuffer("L", (MAX_WIDTH, height), arr, "raw", "L", 0, 1)
+    im.readonly = 0
+    return im
+
+
+_EMOJI_CACHE = {}
+
+
+def _emoji_image(task_type, emoji):
+    # the four TaskType emojis never change, so each is rasterized through
+    # Pilmoji (emoji-source fetch included) once and pasted from cache after.
+    # Lazy rather than at import so module load works offline.
+    cached = _EMOJI_CACHE.get(task_type)
+    if cached is None:
+        cell = Image.new("L", (128, 128), "#ffffff")
+        with Pilmoji(cell, source=EMOJI_SOURCE) as pilmoji:
+            pilmoji.text((0, 0), emoji, font=FONT_LARGE)
+        cached = _EMOJI_CACHE[task_type] = cell
+    return cached
+
+
+def _render_task(task, task_type: TaskType):
     emoji = {
         TaskType.IDEA: "‼️",
         TaskType.URGENT: "🧨",
@@ -77,30 +229,58 @@ def print_task(task, task_type: TaskType):
         TaskType.ARCHIVE: "💾"
     }[task_type]
 
-    im = Image.new("L", (512, 128*2), "#ffffff")
+    im = _blank_canvas(128*2)
 
     # draw_string(im, FONT_LARGE, emoji, (0, 30), MAX_WIDTH,
     #             padding_x=50, align="right")
     # draw_string(im, FONT_LARGE, emoji, (0, 30), MAX_WIDTH,
     #             padding_x=50, align="right")
-    draw_string(im, FONT_LARGE, emoji, (0, 0),
-                padding_x=30, align="left")
-    draw_string(im, FONT, task, (0, font_height(FONT_LARGE)),
+    im.paste(_emoji_image(task_type, emoji), (30, 0))
+    draw_string(im, FONT, task, (0, _H_FONT_LARGE),
                 padding_x=30, align="center")
-    return im
+    # hand escpos an already-binary frame: PIL's C-level dither replaces the
+    # per-pixel L->1 loop inside p.image
+    return im.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
     # im.show()
 
 
-def print_text(text):
+def _render_text(text):
     # im = Image.new("L", (512, 256), "#ffffff")
     # draw_string(im, FONT, text, (0, 104), MAX_WIDTH)
     # text_height = ceil(font_height(
     #     FONT, string=wrap_long_string(text, MAX_WIDTH, FONT)))
-    lines_needed = wrap_long_string(text, MAX_WIDTH, FONT).count("\n") + 1
-    im = Image.new("L", (MAX_WIDTH, ceil(
-        font_height(FONT)) * lines_needed), "#ffffff")
-    draw_string(im, FONT, text, (0, -16), align="center")
-    return im
+    wrapped, text_width = wrap_long_string(text, MAX_WIDTH, FONT)
+    lines_needed = wrapped.count("\n") + 1
+    im = _blank_canvas(ceil(_H_FONT) * lines_needed)
+    draw_string(im, FONT, wrapped, (0, -16), align="center", text_width=text_width)
+    # hand escpos an already-binary frame: PIL's C-level dither replaces the
+    # per-pixel L->1 loop inside p.image
+    return im.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+
+
+# Re-printed phrases (jokes, repeated task labels) are common; memoize the
+# full layout + rasterization. Raw bytes are cached rather than Image objects
+# so callers can't mutate a shared cache entry; frombytes is just a memcpy.
+@lru_cache(maxsize=128)
+def _render_text_raw(text):
+    im = _render_text(text)
+    return im.mode, im.size, im.tobytes()
+
+
+@lru_cache(maxsize=128)
+def _render_task_raw(task, task_type):
+    im = _render_task(task, task_type)
+    return im.mode, im.size, im.tobytes()
+
+
+def print_text(text):
+    mode, size, buf = _render_text_raw(text)
+    return Image.frombytes(mode, size, buf)
+
+
+def print_task(task, task_type: TaskType):
+    mode, size, buf = _render_task_raw(task, task_type)
+    return Image.frombytes(mode, size, buf)
 
 
 if __name__ == "__main__":
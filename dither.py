@@ -0,0 +1,46 @@
+"""Floyd-Steinberg dithering for photographic prints.
+
+Error diffusion is a serial per-pixel dependency chain, so NumPy can't
+vectorize it; numba compiles the loop to native code instead. When numba
+isn't installed, fall back to PIL's C implementation via convert("1").
+"""
+import numpy as np
+from PIL import Image
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _fs_dither(gray):
+        h, w = gray.shape
+        err = gray.astype(np.float32)
+        out = np.zeros((h, w), dtype=np.uint8)
+        for y in range(h):
+            for x in range(w):
+                old = err[y, x]
+                new = 255.0 if old >= 128.0 else 0.0
+                out[y, x] = np.uint8(new)
+                diff = old - new
+                # classic 7/16, 3/16, 5/16, 1/16 error kernel
+                if x + 1 < w:
+                    err[y, x + 1] += diff * (7 / 16)
+                if y + 1 < h:
+                    if x > 0:
+                        err[y + 1, x - 1] += diff * (3 / 16)
+                    err[y + 1, x] += diff * (5 / 16)
+                    if x + 1 < w:
+                        err[y + 1, x + 1] += diff * (1 / 16)
+        return out
+
+
+def fs_dither(img):
+    """Dither a PIL image to pure black/white, returned as mode "L"."""
+    gray = img.convert("L")
+    if njit is None:
+        return gray.convert("1", dither=Image.Dither.FLOYDSTEINBERG).convert("L")
+    return Image.fromarray(_fs_dither(np.asarray(gray)))